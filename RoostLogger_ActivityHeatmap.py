@@ -35,18 +35,15 @@ worldwide through the CC0 1.0 Universal public domain dedication.
 """
 
 import sys, os, os.path
-from datetime import datetime, date, timedelta
-from glob import glob
-import struct
-import mmap
-import contextlib
-import itertools
+from datetime import datetime, date
 
 import numpy as np
 
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 
+from roostlogger_discovery import discover
+
 
 # Display colormap, see:  http://matplotlib.org/examples/color/colormaps_reference.html
 COLORMAP = 'cubehelix'  # afmhot, gist_heat, hot, copper, cool, bone, gray
@@ -64,15 +61,6 @@ _CACHE_FILE_TIMES = '.activity_report.timestamps.txt'
 _CACHE_FILE_DATES = '.activity_report.dates.txt'
 
 
-def anabat_date(fname):
-    """Extract timestamp as datetime from Anabat format file"""
-    # See: http://users.lmi.net/corben/fileform.htm#ANABAT_SEQUENCE_FILE_TYPE_132
-    with open(fname, 'rb') as f:
-        with contextlib.closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as bytes:
-            vals = struct.unpack_from('HBBBBB', bytes, 0x120)
-            return datetime(*vals)
-    
-
 def load_files(dirname, use_cache=False):
     """
     Read all the Anabat files beneath our starting directory
@@ -83,33 +71,11 @@ def load_files(dirname, use_cache=False):
     if not use_cache or not os.path.isfile(os.path.join(dirname, _CACHE_FILE_TIMES)):
         
         ## Read all the Anabat files beneath our starting directory
-        for subdir in os.listdir(dirname):
-            dirpath = os.path.join(dirname, subdir)
-            if not os.path.isdir(dirpath) or not subdir.startswith('20'):
-                continue
-            night = datetime.strptime(subdir, '%Y%m%d').date()
-            dates.append(night)
-
-            dircount= 0
-            anabat_files = itertools.chain(glob(os.path.join(dirpath, '*.*#')), glob(os.path.join(dirpath, '*.zc')))
-            for filepath in anabat_files:
-                dircount += 1
-                timestamp = anabat_date(filepath)
-                timestamps.append(timestamp)
-            print '%s  %4d  %s' % (subdir, dircount, '#' * int(round(dircount/100.0)))
-        
-        if not dates and not timestamps:
-            print 'Loading Anabat files from flat directory...',
-            night_offset = timedelta(hours=-12)
-            for i, filepath in enumerate(glob(os.path.join(dirname, '*.*#'))):
-                timestamp = anabat_date(filepath)
-                night = (timestamp + night_offset).date()
-                dates.append(night)  # one per file; we'll remove dupes later
-                timestamps.append(timestamp)
-                if not i % 100:
-                    print '.',
-            dates = sorted(set(dates))
-            print
+        manifest = discover(dirname)
+        dates = manifest.nights
+        timestamps = manifest.timestamps
+        for night, files in manifest.by_night():
+            print '%s  %4d  %s' % (night.strftime('%Y%m%d'), len(files), '#' * int(round(len(files)/100.0)))
 
         ## Write cache files
         with open(os.path.join(dirname, _CACHE_FILE_TIMES), 'w') as cachefile:
@@ -3,11 +3,9 @@
 import sys
 import os, os.path
 from datetime import datetime
-from glob import glob
 import struct
 import mmap
 import contextlib
-import itertools
 from collections import defaultdict
 
 import numpy as np
@@ -15,17 +13,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator
 
-
-Byte = struct.Struct('< B')
+from roostlogger_discovery import discover
 
 
-def anabat_date(fname):
-    """Extract timestamp as datetime from Anabat format file"""
-    # See: http://users.lmi.net/corben/fileform.htm#ANABAT_SEQUENCE_FILE_TYPE_132
-    with open(fname, 'rb') as f:
-        with contextlib.closing(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)) as bytes:
-            vals = struct.unpack_from('HBBBBB', bytes, 0x120)
-            return datetime(*vals)
+Byte = struct.Struct('< B')
 
 
 def anabat_duration(fname):
@@ -177,24 +168,17 @@ def main(dirname, logscale=False, ignore_cache=False):
 
     if not cache_exists() or ignore_cache:
         ## Read all the Anabat files beneath our starting directory
-        for subdir in os.listdir(dirname):
-            dirpath = os.path.join(dirname, subdir)
-            if not os.path.isdir(dirpath) or not subdir.startswith('20'):
-                continue
-            night = datetime.strptime(subdir, '%Y%m%d').date()
-            dates.append(night)
-
-            dircount = 0
+        manifest = discover(dirname)
+        dates = manifest.nights
+        timestamps = manifest.timestamps
+        for night, files in manifest.by_night():
+            dircount = len(files)
             total_duration = 0.0
-            anabat_files = itertools.chain(glob(os.path.join(dirpath, '*.*#')), glob(os.path.join(dirpath, '*.zc')))
-            for filepath in anabat_files:
-                dircount += 1
-                timestamp = anabat_date(filepath)
-                timestamps.append(timestamp)
-                total_duration += anabat_duration(filepath)
+            for anabat_file in files:
+                total_duration += anabat_duration(anabat_file.path)
             counts.append(dircount)
             durations.append(total_duration)
-            print '%s  %4d  %4.1fs  %s' % (subdir, dircount, total_duration, '#' * int(round(dircount/100.0)))
+            print '%s  %4d  %4.1fs  %s' % (night.strftime('%Y%m%d'), dircount, total_duration, '#' * int(round(dircount/100.0)))
 
         write_cache(dates, timestamps, counts, durations)
     else:
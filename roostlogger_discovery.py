@@ -0,0 +1,187 @@
+"""
+roostlogger_discovery.py - Locate the Anabat files in a RoostLogger
+    deployment folder, whatever its layout.
+
+A RoostLogger normally writes one `YYYYMMDD` folder per night, but
+deployments get copied, merged, flattened, and renamed. Rather than
+rely on any particular layout, we walk the whole tree exactly once and
+recognize Anabat files by extension (`*.*#`, `*.zc`) or, failing that,
+by their header. Each file's night is taken from its parent folder name
+when that is a date, otherwise from the timestamp in its header.
+
+Symbolic links to directories are not followed, so a link back up the
+tree cannot make us count the same recordings more than once.
+
+The resulting manifest is meant to be built once and handed to every
+later stage, so that no directory is listed twice.
+"""
+
+import sys, os, os.path
+from datetime import datetime, timedelta
+from collections import namedtuple
+import struct
+
+try:
+    from scandir import scandir  # backport of Python 3's os.scandir, if installed
+except ImportError:
+    scandir = None
+
+
+# See: http://users.lmi.net/corben/fileform.htm
+# Only file type 132 carries a timestamp; in types 129-131 the sequence
+# data itself starts where 132 stores its date.
+ANABAT_FILE_TYPE = 132
+_DATA_INFO_POINTER = 0x11a
+
+# Extensions we never bother to sniff for an Anabat header
+_NON_ANABAT_EXTS = ('.txt', '.csv', '.wav', '.png', '.jpg', '.pdf', '.xls', '.xlsx', '.zip', '.py', '.pyc')
+
+_HEADER = struct.Struct('< H x B')
+_TIMESTAMP = struct.Struct('< H B B B B B')
+_TIMESTAMP_OFFSET = 0x120
+_HEADER_SIZE = _TIMESTAMP_OFFSET + _TIMESTAMP.size
+
+# Recordings made after midnight belong to the previous evening's night
+_NIGHT_OFFSET = timedelta(hours=-12)
+
+
+AnabatFile = namedtuple('AnabatFile', 'path night timestamp')
+
+
+class Manifest(object):
+    """
+    The Anabat files found beneath a deployment folder.
+
+    `nights` is the sorted list of every night represented, including
+    dated folders which contain no recordings; `files` is the list of
+    `AnabatFile` records sorted by timestamp.
+    """
+
+    def __init__(self, dirname, nights, files):
+        self.dirname = dirname
+        self.nights = nights
+        self.files = files
+
+    def __len__(self):
+        return len(self.files)
+
+    def __iter__(self):
+        return iter(self.files)
+
+    @property
+    def timestamps(self):
+        return [f.timestamp for f in self.files]
+
+    def by_night(self):
+        """Yield (night, [AnabatFile, ...]) for every night, in order"""
+        files_by_night = dict((night, []) for night in self.nights)
+        for f in self.files:
+            files_by_night[f.night].append(f)
+        for night in self.nights:
+            yield night, files_by_night[night]
+
+
+def is_anabat_ext(ext):
+    """Whether a lowercase file extension is an Anabat one (`.*#` or `.zc`)"""
+    return len(ext) > 1 and (ext.endswith('#') or ext == '.zc')
+
+
+def read_anabat_header(fname):
+    """
+    Return the timestamp from an Anabat file's header as a datetime, or
+    None if the file does not have a valid type 132 Anabat header.
+    """
+    # See: http://users.lmi.net/corben/fileform.htm#ANABAT_SEQUENCE_FILE_TYPE_132
+    with open(fname, 'rb') as f:
+        header = f.read(_HEADER_SIZE)
+    if len(header) < _HEADER_SIZE:
+        return None
+    data_info_pointer, file_type = _HEADER.unpack_from(header, 0)
+    if data_info_pointer != _DATA_INFO_POINTER or file_type != ANABAT_FILE_TYPE:
+        return None
+    try:
+        return datetime(*_TIMESTAMP.unpack_from(header, _TIMESTAMP_OFFSET))
+    except ValueError:
+        return None
+
+
+def night_from_dirname(name):
+    """Return the night named by a `YYYYMMDD` folder as a date, or None"""
+    if len(name) != 8 or not name.isdigit():
+        return None
+    try:
+        return datetime.strptime(name, '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def _list_dir(dirpath):
+    """
+    Yield (path, name, is_dir) for each entry of a single directory.
+    Symbolic links to directories are left out entirely.
+    """
+    if scandir is not None:
+        for entry in scandir(dirpath):
+            try:
+                is_dir = entry.is_dir()
+                if is_dir and entry.is_symlink():
+                    continue
+            except OSError:
+                continue
+            yield entry.path, entry.name, is_dir
+    else:
+        for name in os.listdir(dirpath):
+            path = os.path.join(dirpath, name)
+            is_dir = os.path.isdir(path)
+            if is_dir and os.path.islink(path):
+                continue
+            yield path, name, is_dir
+
+
+def discover(dirname):
+    """
+    Walk `dirname` once and return a `Manifest` of the Anabat files within.
+    Symbolic links to directories are skipped rather than followed.
+    """
+    nights = set()
+    files = []
+
+    stack = [(dirname, None)]
+    while stack:
+        dirpath, folder_night = stack.pop()
+        try:
+            entries = list(_list_dir(dirpath))
+        except OSError as e:
+            print >> sys.stderr, e
+            continue
+
+        for path, name, is_dir in entries:
+            if name.startswith('.'):
+                continue  # our own cache files, OS litter, etc.
+
+            if is_dir:
+                night = night_from_dirname(name)
+                if night is not None:
+                    nights.add(night)
+                stack.append((path, night if night is not None else folder_night))
+                continue
+
+            ext = os.path.splitext(name)[1].lower()
+            if ext in _NON_ANABAT_EXTS:
+                continue
+            try:
+                timestamp = read_anabat_header(path)
+            except (IOError, OSError) as e:
+                print >> sys.stderr, e
+                continue
+            if timestamp is None:
+                if is_anabat_ext(ext):
+                    print >> sys.stderr, 'Skipping %s: not a type %d Anabat file' % (path, ANABAT_FILE_TYPE)
+                continue
+
+            night = folder_night if folder_night is not None else (timestamp + _NIGHT_OFFSET).date()
+            nights.add(night)
+            files.append(AnabatFile(path, night, timestamp))
+
+    files.sort(key=lambda f: (f.timestamp, f.path))
+    return Manifest(dirname, sorted(nights), files)